@@ -6,8 +6,23 @@ FiftyOne operator execution.
 |
 """
 import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import math
+import os
+import sys
+import threading
 import traceback
 import types as python_types
+import weakref
+
+from bson import json_util
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 import fiftyone as fo
 import fiftyone.core.dataset as fod
@@ -22,6 +37,9 @@ from .registry import OperatorRegistry
 from .message import GeneratedMessage, MessageType
 
 
+logger = logging.getLogger(__name__)
+
+
 class ExecutionRunState(object):
     """Enumeration of the available operator run states."""
 
@@ -39,6 +57,8 @@ class InvocationRequest(object):
         params (None): an optional dictionary of parameters
     """
 
+    __slots__ = ("operator_uri", "params")
+
     def __init__(self, operator_uri, params=None):
         self.operator_uri = operator_uri
         self.params = params or {}
@@ -74,21 +94,117 @@ class Executor(object):
             the result of the invocation
         """
         inv_req = InvocationRequest(operator_name, params=params)
-        self._requests.append(inv_req)
+        if not self._merge_request(inv_req):
+            self._requests.append(inv_req)
+
         return GeneratedMessage(
             MessageType.SUCCESS, cls=InvocationRequest, body=inv_req
         )
 
+    def _merge_request(self, inv_req):
+        # Merges the request into the previous request, if both invoke the
+        # same batchable operator. The previous request is replaced rather
+        # than modified, since it may have already been sent to the App
+        if not self._requests:
+            return False
+
+        last_req = self._requests[-1]
+        if last_req.operator_uri != inv_req.operator_uri:
+            return False
+
+        merge = _BATCHABLE_OPERATORS.get(inv_req.operator_uri, None)
+        if merge is None:
+            return False
+
+        params = merge(last_req.params, inv_req.params)
+        if params is None:
+            return False
+
+        self._requests[-1] = InvocationRequest(
+            last_req.operator_uri, params=params
+        )
+        return True
+
     def log(self, message):
         """Logs a message."""
         self._logs.append(message)
 
     def to_json(self):
+        # InvocationRequest.to_json() is inlined here, since executors may
+        # contain many requests
         return {
-            "requests": [t.to_json() for t in self._requests],
+            "requests": [
+                {"operator_uri": t.operator_uri, "params": t.params}
+                for t in self._requests
+            ],
             "logs": self._logs,
         }
 
+    def to_json_bytes(self):
+        """Returns a serialized JSON representation of the executor.
+
+        Returns:
+            JSON bytes
+        """
+        return _dumps(self.to_json())
+
+
+def _merge_console_logs(params, other_params):
+    message = params.get("message", None)
+    other_message = other_params.get("message", None)
+    if (
+        len(params) != 1
+        or len(other_params) != 1
+        or not isinstance(message, str)
+        or not isinstance(other_message, str)
+    ):
+        return None
+
+    return {"message": message + "\n" + other_message}
+
+
+# Operators whose consecutive invocations can be merged into a single request,
+# mapped to functions that return the merged params, or None if the params
+# cannot be merged
+_BATCHABLE_OPERATORS = {"console_log": _merge_console_logs}
+
+
+def _dumps(obj):
+    # Serializes the given object to JSON bytes. orjson is used when it is
+    # installed, with BSON types like ObjectId and datetime encoded the same
+    # way as json_util.dumps(). Objects that orjson would encode differently,
+    # i.e., non-finite floats, which it encodes as null, or cannot encode,
+    # e.g., float subclasses and integers wider than 64 bits, are encoded with
+    # json_util.dumps()
+    if orjson is not None and not _has_non_finite_floats(obj):
+        try:
+            # pylint: disable=no-member
+            return orjson.dumps(
+                obj,
+                default=json_util.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_NON_STR_KEYS,
+            )
+        except TypeError:
+            pass
+
+    return json_util.dumps(obj).encode()
+
+
+def _has_non_finite_floats(obj):
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        value_type = type(value)
+        if value_type is dict:
+            stack.extend(value.values())
+        elif value_type is list or value_type is tuple:
+            stack.extend(value)
+        elif value_type is float and not math.isfinite(value):
+            return True
+
+    return False
+
 
 def execute_operator(operator_uri, ctx, params):
     """Executes the operator with the given name.
@@ -102,7 +218,8 @@ def execute_operator(operator_uri, ctx, params):
                 name of a dataset to process. This is required unless a
                 ``view`` is provided
             -   ``view``: an optional :class:`fiftyone.core.view.DatasetView`
-                to process
+                to process, or a list of serialized view stages of the
+                ``dataset`` to process
             -   ``selected``: an optional list of selected sample IDs
             -   ``selected_labels``: an optional list of selected labels in the
                 format returned by
@@ -114,6 +231,15 @@ def execute_operator(operator_uri, ctx, params):
     Returns:
         an :class:`ExecutionResult`
     """
+    if _has_running_loop():
+        # Blocking a running event loop until the operator completes would
+        # stall it, or deadlock if it is the loop that executes the operator
+        raise RuntimeError(
+            "execute_operator() cannot be called from a running event loop. "
+            "Use execute_or_delegate_operator() instead"
+        )
+
+    operator_uri = sys.intern(operator_uri)
     dataset_name, view_stages, selected, selected_labels = _parse_ctx(ctx)
 
     request_params = dict(
@@ -125,10 +251,85 @@ def execute_operator(operator_uri, ctx, params):
         params=params,
     )
 
-    return asyncio.run(
-        execute_or_delegate_operator(operator_uri, request_params)
+    if getattr(_POOL_THREAD_STATE, "is_pool_thread", False):
+        # This is a nested call from a sync operator that is running in the
+        # background loop's executor. Waiting on that loop could deadlock if
+        # all of its executor's threads are waiting too, so the operator is
+        # run in a new event loop with its own executor instead
+        return asyncio.run(
+            execute_or_delegate_operator(operator_uri, request_params)
+        )
+
+    future = asyncio.run_coroutine_threadsafe(
+        execute_or_delegate_operator(operator_uri, request_params),
+        _get_event_loop(),
     )
 
+    try:
+        return future.result()
+    except BaseException:
+        # Don't leave the operator running if the caller is interrupted
+        future.cancel()
+        raise
+
+
+def _has_running_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+
+    return True
+
+
+_LOOP = None
+_LOOP_LOCK = threading.Lock()
+_POOL_THREAD_STATE = threading.local()
+
+
+def _init_pool_thread():
+    _POOL_THREAD_STATE.is_pool_thread = True
+
+
+def _reset_event_loop():
+    # Forked processes don't inherit the background loop's thread, so they
+    # must start their own loop
+    global _LOOP, _LOOP_LOCK
+
+    _LOOP = None
+    _LOOP_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_event_loop)
+
+
+def _get_event_loop():
+    # A persistent event loop running in a background thread, so that
+    # execute_operator() doesn't create and tear down a new event loop and
+    # default executor on every call
+    global _LOOP
+
+    if _LOOP is None:
+        with _LOOP_LOCK:
+            if _LOOP is None:
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(
+                    ThreadPoolExecutor(
+                        max_workers=fo.config.max_thread_pool_workers,
+                        initializer=_init_pool_thread,
+                    )
+                )
+                thread = threading.Thread(
+                    target=loop.run_forever,
+                    name="fiftyone-operators",
+                    daemon=True,
+                )
+                thread.start()
+                _LOOP = loop
+
+    return _LOOP
+
 
 def _parse_ctx(ctx):
     dataset = ctx.get("dataset", None)
@@ -140,12 +341,13 @@ def _parse_ctx(ctx):
         dataset = view._root_dataset
 
     if view is None:
-        if isinstance(dataset, str):
-            dataset = fod.load_dataset(dataset)
-
-        view = dataset.view()
-
-    view_stages = view._serialize()
+        # the full dataset view has no stages, so there is no need to load
+        # the dataset if only its name was provided
+        view_stages = []
+    elif isinstance(view, list):
+        view_stages = view
+    else:
+        view_stages = _serialize_view(view)
 
     if isinstance(dataset, fod.Dataset):
         dataset_name = dataset.name
@@ -155,6 +357,27 @@ def _parse_ctx(ctx):
     return dataset_name, view_stages, selected, selected_labels
 
 
+_VIEW_STAGES_CACHE = {}
+
+
+def _serialize_view(view):
+    # Views are immutable, so their serialized stages are cached by view
+    # identity. Views are not hashable, so the cache is keyed by ``id(view)``
+    # and entries are removed when their view is garbage collected
+    key = id(view)
+    entry = _VIEW_STAGES_CACHE.get(key, None)
+    if entry is not None and entry[0]() is view:
+        return list(entry[1])
+
+    def _remove(ref):
+        if _VIEW_STAGES_CACHE.get(key, (None,))[0] is ref:
+            del _VIEW_STAGES_CACHE[key]
+
+    view_stages = view._serialize()
+    _VIEW_STAGES_CACHE[key] = (weakref.ref(view, _remove), view_stages)
+    return list(view_stages)
+
+
 @coroutine_timeout(seconds=fo.config.operator_timeout)
 async def execute_or_delegate_operator(operator_uri, request_params):
     """Executes the operator with the given name.
@@ -191,26 +414,40 @@ async def execute_or_delegate_operator(operator_uri, request_params):
                 else None
             )
             return execution
-        except Exception as e:
-            return ExecutionResult(
-                executor=executor, error=traceback.format_exc()
-            )
+        except Exception:
+            return _error_result(executor)
     else:
         try:
             raw_result = await (
                 operator.execute(ctx)
-                if asyncio.iscoroutinefunction(operator.execute)
+                if _is_coroutine_execute(operator)
                 else fou.run_sync_task(operator.execute, ctx)
             )
-
-        except Exception as e:
-            return ExecutionResult(
-                executor=executor, error=traceback.format_exc()
-            )
+        except Exception:
+            return _error_result(executor)
 
         return ExecutionResult(result=raw_result, executor=executor)
 
 
+def _is_coroutine_execute(operator):
+    # Whether the operator's execute() method is a coroutine function. This is
+    # fixed when the operator is defined, so it is cached on the operator
+    is_coro = getattr(operator, "_execute_is_coro", None)
+    if type(is_coro) is not bool:
+        is_coro = asyncio.iscoroutinefunction(operator.execute)
+        operator._execute_is_coro = is_coro
+
+    return is_coro
+
+
+def _error_result(executor=None):
+    # Captures the exception currently being handled. The traceback is only
+    # formatted if the result's error is actually accessed
+    result = ExecutionResult(executor=executor)
+    result._exc_info = sys.exc_info()
+    return result
+
+
 async def prepare_operator_executor(operator_uri, request_params):
     registry = OperatorRegistry()
     if registry.operator_exists(operator_uri) is False:
@@ -219,10 +456,26 @@ async def prepare_operator_executor(operator_uri, request_params):
     operator = registry.get_operator(operator_uri)
     executor = Executor()
     ctx = ExecutionContext(request_params, executor)
-    await ctx.resolve_secret_values(operator._plugin_secrets)
-    inputs = operator.resolve_input(ctx)
-    validation_ctx = ValidationContext(ctx, inputs, operator)
-    if validation_ctx.invalid:
+    if (
+        operator._plugin_secrets
+        and not operator.config.requires_secrets_for_input
+    ):
+        # Resolve the operator's secrets while its inputs are resolved
+        _, inputs = await asyncio.gather(
+            ctx.resolve_secret_values(operator._plugin_secrets),
+            fou.run_sync_task(operator.resolve_input, ctx),
+        )
+    else:
+        await ctx.resolve_secret_values(operator._plugin_secrets)
+        inputs = operator.resolve_input(ctx)
+
+    # Operators without inputs have nothing to validate
+    if inputs is None:
+        validation_ctx = None
+    else:
+        validation_ctx = ValidationContext(ctx, inputs, operator)
+
+    if validation_ctx is not None and validation_ctx.invalid:
         return ExecutionResult(
             error="Validation error", validation_ctx=validation_ctx
         )
@@ -230,10 +483,15 @@ async def prepare_operator_executor(operator_uri, request_params):
     return operator, executor, ctx
 
 
+_GENERATOR_TYPES = (
+    python_types.GeneratorType,
+    python_types.AsyncGeneratorType,
+)
+
+
 def _is_generator(value):
-    return isinstance(value, python_types.GeneratorType) or isinstance(
-        value, python_types.AsyncGeneratorType
-    )
+    # Generator types cannot be subclassed, so an exact type check suffices
+    return type(value) in _GENERATOR_TYPES
 
 
 def resolve_type(registry, operator_uri, request_params):
@@ -289,12 +547,26 @@ class ExecutionContext(object):
         executor (None): an optional :class:`Executor` instance
     """
 
+    _PUBLIC_FIELDS = ("request_params", "params", "executor")
+
+    # ``__dict__`` is included so that operators can still set their own
+    # attributes on the context
+    __slots__ = _PUBLIC_FIELDS + (
+        "_secrets",
+        "_secrets_client",
+        "_view_cache",
+        "_dataset_cache",
+        "__dict__",
+    )
+
     def __init__(self, request_params=None, executor=None):
         self.request_params = request_params or {}
         self.params = self.request_params.get("params", {})
         self.executor = executor
         self._secrets = {}
         self._secrets_client = PluginSecretsResolver()
+        self._view_cache = None
+        self._dataset_cache = None
 
     @property
     def results(self):
@@ -319,12 +591,24 @@ class ExecutionContext(object):
         extended = self.request_params.get("extended", None)
         dataset_name = self.request_params.get("dataset_name", None)
         filters = self.request_params.get("filters", None)
-        return fosv.get_view(
+
+        # request params are not modified during execution, so the identities
+        # of its containers are sufficient to detect changes. The containers
+        # are stored so that their identities cannot be reused
+        key = (dataset_name, stages, extended, filters)
+        if self._view_cache is not None:
+            cached_key, view = self._view_cache
+            if all(k1 is k2 for k1, k2 in zip(cached_key, key)):
+                return view
+
+        view = fosv.get_view(
             dataset_name,
             stages=stages,
             extended_stages=extended,
             filters=filters,
         )
+        self._view_cache = (key, view)
+        return view
 
     @property
     def selected(self):
@@ -347,7 +631,14 @@ class ExecutionContext(object):
     def dataset(self):
         """The :class:`fiftyone.core.dataset.Dataset` to operate on."""
         dataset_name = self.request_params.get("dataset_name", None)
+        if (
+            self._dataset_cache is not None
+            and self._dataset_cache[0] == dataset_name
+        ):
+            return self._dataset_cache[1]
+
         d = fod.load_dataset(dataset_name)
+        self._dataset_cache = (dataset_name, d)
         return d
 
     @property
@@ -364,6 +655,16 @@ class ExecutionContext(object):
         """
         return self.request_params.get("dataset_id", None)
 
+    def invalidate(self):
+        """Clears the cached :attr:`view` and :attr:`dataset` of this context.
+
+        Operators that modify the dataset in ways that affect the current view
+        can call this method to ensure that subsequent accesses to
+        :attr:`view` and :attr:`dataset` are reloaded.
+        """
+        self._view_cache = None
+        self._dataset_cache = None
+
     def trigger(self, operator_name, params=None):
         """Triggers an invocation of the operator with the given name.
 
@@ -409,12 +710,20 @@ class ExecutionContext(object):
             kwargs: additional keyword arguments to pass to the secrets
             client for authentication if required
         """
-        if None in (self._secrets_client, keys):
+        if None in (self._secrets_client, keys) or not keys:
             return None
-        for key in keys:
-            secret = await self._secrets_client.get_secret(key, **kwargs)
 
-            if secret:
+        secrets = await asyncio.gather(
+            *(self._secrets_client.get_secret(k, **kwargs) for k in keys),
+            return_exceptions=True,
+        )
+
+        for key, secret in zip(keys, secrets):
+            if isinstance(secret, BaseException):
+                logger.warning(
+                    "Failed to resolve secret '%s': %s", key, secret
+                )
+            elif secret:
                 self._secrets[secret.key] = secret.value
 
     def serialize(self):
@@ -430,9 +739,11 @@ class ExecutionContext(object):
 
     def to_dict(self):
         """Returns the properties of the execution context as a dict."""
-        return {
-            k: v for k, v in self.__dict__.items() if not k.startswith("_")
-        }
+        d = {k: getattr(self, k) for k in self._PUBLIC_FIELDS}
+        d.update(
+            (k, v) for k, v in self.__dict__.items() if not k.startswith("_")
+        )
+        return d
 
 
 class ExecutionResult(object):
@@ -445,6 +756,15 @@ class ExecutionResult(object):
         validation_ctx (None): a :class:`ValidationContext`
     """
 
+    __slots__ = (
+        "result",
+        "executor",
+        "_error",
+        "_exc_info",
+        "validation_ctx",
+        "delegated",
+    )
+
     def __init__(
         self,
         result=None,
@@ -459,6 +779,20 @@ class ExecutionResult(object):
         self.validation_ctx = validation_ctx
         self.delegated = delegated
 
+    @property
+    def error(self):
+        """The error message of the execution, if any."""
+        if self._error is None and self._exc_info is not None:
+            self._error = "".join(traceback.format_exception(*self._exc_info))
+            self._exc_info = None
+
+        return self._error
+
+    @error.setter
+    def error(self, error):
+        self._error = error
+        self._exc_info = None
+
     @property
     def is_generator(self):
         """Whether the result is a generator or an async generator."""
@@ -473,7 +807,7 @@ class ExecutionResult(object):
         """
         msg = self.error
 
-        if self.validation_ctx.invalid:
+        if self.validation_ctx is not None and self.validation_ctx.invalid:
             val_error = self.validation_ctx.errors[0]
             path = val_error.path.lstrip(".")
             reason = val_error.reason
@@ -497,6 +831,14 @@ class ExecutionResult(object):
             else None,
         }
 
+    def to_json_bytes(self):
+        """Returns a serialized JSON representation of the result.
+
+        Returns:
+            JSON bytes
+        """
+        return _dumps(self.to_json())
+
 
 class ExecutionError(Exception):
     """An error that occurs while executing an operator."""
@@ -511,6 +853,8 @@ class ValidationError(object):
         path: the path
     """
 
+    __slots__ = ("reason", "error_message", "path", "custom")
+
     def __init__(self, reason, property, path, custom=False):
         self.reason = reason
         self.error_message = property.error_message
@@ -603,32 +947,28 @@ class ValidationContext(object):
     def validate_list(self, path, property, value):
         """Validates a list value.
 
+        Any errors in the elements of the list are added to this context.
+
         Args:
             path: the path to the property
             property: the :class:`fiftyone.operators.types.Property`
             value: the value to validate
 
         Returns:
-            a :class:`ValidationError`, if the value is invalid
+            a :class:`ValidationError`, if the value is not a list
         """
         if not isinstance(value, list):
             return ValidationError("Invalid list", property, path)
 
-        element_type = property.type.element_type
-
-        for i in range(len(value)):
-            item = value[i]
-            item_path = f"{path}[{i}]"
-            item_property = types.Property(element_type)
-            validation_error = self.validate_property(
-                item_path, item_property, item
-            )
-            if validation_error is not None:
-                self.add_error(validation_error)
+        stack = deque()
+        self._push_list_items(path, property, value, stack)
+        self._validate_stack(stack)
 
     def validate_property(self, path, property, value):
         """Validates a property value.
 
+        Any errors in nested values of the property are added to this context.
+
         Args:
             path: the path to the property
             property: the :class:`fiftyone.operators.types.Property`
@@ -637,49 +977,96 @@ class ValidationContext(object):
         Returns:
             a :class:`ValidationError`, if the value is invalid
         """
-        if property.invalid:
-            return ValidationError(
-                property.error_message, property, path, True
-            )
-
-        if property.required and value is None:
-            return ValidationError("Required property", property, path)
-
-        if value is not None:
-            if isinstance(property.type, types.Enum):
-                return self.validate_enum(path, property, value)
-
-            if isinstance(property.type, types.Object):
-                return self.validate_object(path, property, value)
-
-            if isinstance(property.type, types.List):
-                return self.validate_list(path, property, value)
-
-            return self.validate_primitive(path, property, value)
+        stack = deque()
+        validation_error = self._validate_item(path, property, value, stack)
+        self._validate_stack(stack)
+        return validation_error
 
     def validate_object(self, path, property, value):
         """Validates an object value.
 
+        Any errors in the properties of the object are added to this context.
+
         Args:
             path: the path to the property
             property: the :class:`fiftyone.operators.types.Property`
             value: the value to validate
 
         Returns:
-            a :class:`ValidationError`, if the value is invalid
+            a :class:`ValidationError`, if the value is None
         """
-        propertyType = property.type
         if value is None:
             return ValidationError("Invalid object", property, path)
 
-        for name, property in propertyType.properties.items():
-            propertyValue = value.get(name, None)
-            validation_error = self.validate_property(
-                path + "." + name, property, propertyValue
+        stack = deque()
+        self._push_object_properties(path, property, value, stack)
+        self._validate_stack(stack)
+
+    def _validate_stack(self, stack):
+        # Validates the ``(path, property, value)`` items on the stack, and
+        # those pushed while validating them, in depth-first order
+        while stack:
+            path, property, value = stack.pop()
+            validation_error = self._validate_item(
+                path, property, value, stack
             )
             if validation_error is not None:
                 self.add_error(validation_error)
 
+    def _validate_item(self, path, property, value, stack):
+        # Returns the error for the given value itself, if any. Nested values
+        # of objects and lists are pushed onto the stack for validation
+        if property.invalid:
+            return ValidationError(
+                property.error_message, property, path, True
+            )
+
+        if property.required and value is None:
+            return ValidationError("Required property", property, path)
+
+        if value is None:
+            return None
+
+        if isinstance(property.type, types.Enum):
+            return self.validate_enum(path, property, value)
+
+        if isinstance(property.type, types.Object):
+            self._push_object_properties(path, property, value, stack)
+            return None
+
+        if isinstance(property.type, types.List):
+            if not isinstance(value, list):
+                return ValidationError("Invalid list", property, path)
+
+            self._push_list_items(path, property, value, stack)
+            return None
+
+        return self.validate_primitive(path, property, value)
+
+    def _push_object_properties(self, path, property, value, stack):
+        # Properties are pushed in reverse so that they are popped in order
+        properties = list(property.type.properties.items())
+        for name, prop in reversed(properties):
+            stack.append((path + "." + name, prop, value.get(name, None)))
+
+    def _push_list_items(self, path, property, value, stack):
+        element_type = property.type.element_type
+
+        # Fast path for lists of primitives, which only need to be validated
+        # element-wise if they contain invalid values
+        check = _PRIMITIVE_CHECKS.get(type(element_type), None)
+        if check is not None and all(v is None or check(v) for v in value):
+            return
+
+        # All items share the same property, which is not modified during
+        # validation. Items are pushed in reverse so that they are popped in
+        # order
+        item_property = types.Property(element_type)
+        item_path_prefix = path + "["
+        for i in reversed(range(len(value))):
+            item_path = item_path_prefix + str(i) + "]"
+            stack.append((item_path, item_property, value[i]))
+
     def validate_primitive(self, path, property, value):
         """Validates a primitive value.
 
@@ -691,15 +1078,13 @@ class ValidationContext(object):
         Returns:
             a :class:`ValidationError`, if the value is invalid
         """
-        type_name = property.type.__class__.__name__
-        value_type = type(value)
-        if type_name == "String" and value_type != str:
+        check = _PRIMITIVE_CHECKS.get(type(property.type), None)
+        if check is not None and not check(value):
             return ValidationError("Invalid value type", property, path)
 
-        if type_name == "Number" and (
-            value_type != int and value_type != float
-        ):
-            return ValidationError("Invalid value type", property, path)
 
-        if type_name == "Boolean" and value_type != bool:
-            return ValidationError("Invalid value type", property, path)
+_PRIMITIVE_CHECKS = {
+    types.String: lambda v: type(v) is str,
+    types.Number: lambda v: type(v) in (int, float),
+    types.Boolean: lambda v: type(v) is bool,
+}
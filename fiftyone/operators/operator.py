@@ -27,6 +27,10 @@ class OperatorConfig(object):
         on_startup (False): whether the operator should be executed on startup
         disable_schema_validation (False): whether the operator built-in schema
             validation should be disabled
+        requires_secrets_for_input (True): whether the operator's
+            :meth:`Operator.resolve_input` method requires the operator's
+            secrets. If False, the secrets are resolved concurrently with the
+            inputs when the operator is executed
     """
 
     def __init__(
@@ -43,6 +47,7 @@ class OperatorConfig(object):
         icon=None,
         light_icon=None,
         dark_icon=None,
+        requires_secrets_for_input=True,
     ):
         self.name = name
         self.label = label or name
@@ -56,6 +61,7 @@ class OperatorConfig(object):
         self.icon = icon
         self.dark_icon = dark_icon
         self.light_icon = light_icon
+        self.requires_secrets_for_input = requires_secrets_for_input
 
     def to_json(self):
         return {
@@ -71,6 +77,7 @@ class OperatorConfig(object):
             "icon": self.icon,
             "dark_icon": self.dark_icon,
             "light_icon": self.light_icon,
+            "requires_secrets_for_input": self.requires_secrets_for_input,
         }
 
 
@@ -5,6 +5,8 @@ FiftyOne operator registry.
 | `voxel51.com <https://voxel51.com/>`_
 |
 """
+import sys
+
 from .builtin import BUILTIN_OPERATORS
 import fiftyone.plugins.context as fopc
 
@@ -49,6 +51,7 @@ class OperatorRegistry(object):
 
     def __init__(self, enabled=True):
         self.plugin_contexts = fopc.build_plugin_contexts(enabled=enabled)
+        self._operators_by_uri = None
 
     def list_operators(self, include_builtin=True):
         """Lists the available FiftyOne operators.
@@ -89,11 +92,7 @@ class OperatorRegistry(object):
         Returns:
             True/False
         """
-        for operator in self.list_operators():
-            if operator_uri == operator.uri:
-                return True
-
-        return False
+        return operator_uri in self._get_operators_by_uri()
 
     def can_execute(self, operator_uri):
         """Whether the operator can be executed.
@@ -115,8 +114,15 @@ class OperatorRegistry(object):
         Returns:
             an :class:`fiftyone.operators.Operator`, or None
         """
-        for operator in self.list_operators():
-            if operator_uri == operator.uri:
-                return operator
+        return self._get_operators_by_uri().get(operator_uri, None)
+
+    def _get_operators_by_uri(self):
+        if self._operators_by_uri is None:
+            operators_by_uri = {}
+            for operator in self.list_operators():
+                # if multiple operators have the same URI, the first one wins
+                operators_by_uri.setdefault(sys.intern(operator.uri), operator)
+
+            self._operators_by_uri = operators_by_uri
 
-        return None
+        return self._operators_by_uri
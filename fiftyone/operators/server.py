@@ -9,8 +9,9 @@ import types
 from starlette.endpoints import HTTPEndpoint
 from starlette.exceptions import HTTPException
 from starlette.requests import Request
-from starlette.responses import JSONResponse, StreamingResponse
+from starlette.responses import JSONResponse, Response, StreamingResponse
 
+from fiftyone.core.utils import run_sync_task
 from fiftyone.server.decorators import route
 
 from .executor import (
@@ -89,7 +90,7 @@ class ExecuteOperator(HTTPEndpoint):
             raise HTTPException(status_code=404, detail=error_detail)
 
         result = await execute_or_delegate_operator(operator_uri, data)
-        return result.to_json()
+        return Response(await run_sync_task(result.to_json_bytes))
 
 
 def create_response_generator(generator):
@@ -156,7 +157,9 @@ class ExecuteOperatorAsGenerator(HTTPEndpoint):
                 },
             )
         else:
-            return execution_result.to_json()
+            return Response(
+                await run_sync_task(execution_result.to_json_bytes)
+            )
 
 
 class ResolveType(HTTPEndpoint):
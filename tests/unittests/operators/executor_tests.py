@@ -0,0 +1,728 @@
+"""
+Unit tests for operators/executor.
+
+| Copyright 2017-2023, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+"""
+import asyncio
+from datetime import datetime
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+from bson import json_util, ObjectId
+
+import fiftyone.operators.executor as foe
+import fiftyone.operators.types as types
+
+
+class EventLoopTests(unittest.TestCase):
+    def test_event_loop_is_reused(self):
+        loop1 = foe._get_event_loop()
+        loop2 = foe._get_event_loop()
+
+        self.assertIs(loop1, loop2)
+        self.assertTrue(loop1.is_running())
+
+    def test_run_coroutine(self):
+        async def coro(x):
+            return x + 1
+
+        future = asyncio.run_coroutine_threadsafe(
+            coro(1), foe._get_event_loop()
+        )
+
+        self.assertEqual(future.result(), 2)
+
+    def test_reentrant_execute_operator(self):
+        async def coro():
+            return foe.execute_operator("@test/op", {"dataset": "test"}, {})
+
+        future = asyncio.run_coroutine_threadsafe(
+            coro(), foe._get_event_loop()
+        )
+
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=5)
+
+    def test_execute_operator_from_running_loop(self):
+        async def coro():
+            return foe.execute_operator("@test/op", {"dataset": "test"}, {})
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(coro())
+
+    @patch("fiftyone.operators.executor.execute_or_delegate_operator")
+    def test_execute_operator_interrupted(self, mock_execute):
+        started = threading.Event()
+        cancelled = threading.Event()
+
+        async def execute(*args):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        mock_execute.side_effect = execute
+
+        with patch("concurrent.futures.Future.result") as mock_result:
+
+            def result(*args, **kwargs):
+                started.wait(5)
+                raise KeyboardInterrupt
+
+            mock_result.side_effect = result
+
+            with self.assertRaises(KeyboardInterrupt):
+                foe.execute_operator(
+                    "@test/op", {"dataset": "test", "view": []}, {}
+                )
+
+        self.assertTrue(cancelled.wait(5))
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires os.fork()")
+    def test_event_loop_after_fork(self):
+        async def coro(x):
+            return x + 1
+
+        foe._get_event_loop()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                future = asyncio.run_coroutine_threadsafe(
+                    coro(1), foe._get_event_loop()
+                )
+                os._exit(0 if future.result(timeout=5) == 2 else 1)
+            except BaseException:
+                os._exit(1)
+
+        _, status = os.waitpid(pid, 0)
+
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+
+    @patch("fiftyone.operators.executor.execute_or_delegate_operator")
+    def test_nested_execute_operator(self, mock_execute):
+        async def execute(*args):
+            return asyncio.get_running_loop()
+
+        def execute_operator():
+            return foe.execute_operator(
+                "@test/op", {"dataset": "test", "view": []}, {}
+            )
+
+        async def execute_in_executor():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, execute_operator)
+
+        mock_execute.side_effect = execute
+        loop = foe._get_event_loop()
+
+        # nested calls from the background loop's executor don't wait on
+        # the background loop
+        nested_loop = asyncio.run_coroutine_threadsafe(
+            execute_in_executor(), loop
+        ).result(timeout=5)
+
+        self.assertIs(execute_operator(), loop)
+        self.assertIsNot(nested_loop, loop)
+
+
+class ExecutionContextCacheTests(unittest.TestCase):
+    @patch("fiftyone.server.view.get_view")
+    def test_view_is_cached(self, mock_get_view):
+        ctx = foe.ExecutionContext(
+            request_params={"dataset_name": "test", "view": []}
+        )
+
+        view1 = ctx.view
+        view2 = ctx.view
+
+        self.assertIs(view1, view2)
+        mock_get_view.assert_called_once()
+
+        ctx.request_params["view"] = [{"_cls": "foo"}]
+        ctx.view
+
+        self.assertEqual(mock_get_view.call_count, 2)
+
+    @patch("fiftyone.core.dataset.load_dataset")
+    def test_dataset_is_cached(self, mock_load_dataset):
+        ctx = foe.ExecutionContext(request_params={"dataset_name": "test"})
+
+        dataset1 = ctx.dataset
+        dataset2 = ctx.dataset
+
+        self.assertIs(dataset1, dataset2)
+        mock_load_dataset.assert_called_once_with("test")
+
+    @patch("fiftyone.server.view.get_view")
+    @patch("fiftyone.core.dataset.load_dataset")
+    def test_invalidate(self, mock_load_dataset, mock_get_view):
+        ctx = foe.ExecutionContext(request_params={"dataset_name": "test"})
+
+        ctx.view
+        ctx.dataset
+        ctx.invalidate()
+        ctx.view
+        ctx.dataset
+
+        self.assertEqual(mock_get_view.call_count, 2)
+        self.assertEqual(mock_load_dataset.call_count, 2)
+
+    def test_view_cache_holds_request_params(self):
+        views = []
+
+        def get_view(*args, **kwargs):
+            # unlike a mock, this doesn't keep references to its arguments
+            views.append(object())
+            return views[-1]
+
+        ctx = foe.ExecutionContext(
+            request_params={"dataset_name": "test", "view": []}
+        )
+
+        with patch("fiftyone.server.view.get_view", new=get_view):
+            view1 = ctx.view
+
+            # replacing the stages must invalidate the view even if the old
+            # stages are garbage collected and their id is reused
+            del ctx.request_params["view"]
+            ctx.request_params["view"] = []
+            view2 = ctx.view
+
+        self.assertIsNot(view1, view2)
+
+
+class MockOperatorConfig(object):
+    def __init__(
+        self, disable_schema_validation=False, requires_secrets_for_input=True
+    ):
+        self.disable_schema_validation = disable_schema_validation
+        self.requires_secrets_for_input = requires_secrets_for_input
+
+
+class MockOperator(object):
+    def __init__(
+        self, disable_schema_validation=False, requires_secrets_for_input=True
+    ):
+        self._plugin_secrets = None
+        self.config = MockOperatorConfig(
+            disable_schema_validation=disable_schema_validation,
+            requires_secrets_for_input=requires_secrets_for_input,
+        )
+
+
+class MockSyncOperator(MockOperator):
+    def __init__(self, success=True):
+        self.success = success
+        super().__init__()
+
+    def resolve_delegation(self, ctx):
+        return False
+
+    def execute(self, ctx):
+        if not self.success:
+            raise ValueError("MockSyncOperator failed")
+
+        return {"thread": threading.current_thread().name}
+
+
+def _make_inputs():
+    inputs = types.Object()
+    inputs.str("name", required=True)
+    inputs.int("count")
+    inputs.enum("kind", ["a", "b"])
+
+    nested = types.Object()
+    nested.str("x", required=True)
+    inputs.define_property("nested", nested)
+
+    inputs.list("nums", types.Number())
+
+    return types.Property(inputs)
+
+
+def _validate(params, inputs=None, disable_schema_validation=False):
+    if inputs is None:
+        inputs = _make_inputs()
+
+    ctx = foe.ExecutionContext(request_params={"params": params})
+    operator = MockOperator(
+        disable_schema_validation=disable_schema_validation
+    )
+    return foe.ValidationContext(ctx, inputs, operator)
+
+
+class ValidationContextTests(unittest.TestCase):
+    def test_valid(self):
+        validation_ctx = _validate(
+            {"name": "foo", "count": 1, "kind": "a", "nums": [1, 2.0]}
+        )
+
+        self.assertFalse(validation_ctx.invalid)
+        self.assertListEqual(validation_ctx.errors, [])
+
+    def test_no_inputs(self):
+        ctx = foe.ExecutionContext(request_params={"params": {}})
+        validation_ctx = foe.ValidationContext(ctx, None, MockOperator())
+
+        self.assertFalse(validation_ctx.invalid)
+
+    def test_invalid(self):
+        validation_ctx = _validate(
+            {"count": "1", "kind": "c", "nested": {}, "nums": [1, "2"]}
+        )
+
+        errors = [(e.path, e.reason) for e in validation_ctx.errors]
+        self.assertListEqual(
+            errors,
+            [
+                (".name", "Required property"),
+                (".count", "Invalid value type"),
+                (".kind", "Invalid enum value"),
+                (".nested.x", "Required property"),
+                (".nums[1]", "Invalid value type"),
+            ],
+        )
+
+    def test_missing_optional_object(self):
+        validation_ctx = _validate({"name": "foo"})
+
+        self.assertFalse(validation_ctx.invalid)
+
+    def test_custom_error(self):
+        inputs = _make_inputs()
+        inputs.type.str("custom", invalid=True, error_message="Bad value")
+
+        validation_ctx = _validate(
+            {"name": "foo", "count": "1"},
+            inputs=inputs,
+            disable_schema_validation=True,
+        )
+
+        errors = [(e.path, e.reason, e.custom) for e in validation_ctx.errors]
+        self.assertListEqual(errors, [(".custom", "Bad value", True)])
+
+    def test_inputs_are_reusable(self):
+        inputs = _make_inputs()
+
+        validation_ctx1 = _validate({"name": "foo"}, inputs=inputs)
+        validation_ctx2 = _validate({"count": 1}, inputs=inputs)
+
+        self.assertFalse(validation_ctx1.invalid)
+        self.assertTrue(validation_ctx2.invalid)
+
+    def test_primitive_types(self):
+        inputs = types.Object()
+        inputs.str("str")
+        inputs.int("num")
+        inputs.bool("bool")
+        inputs = types.Property(inputs)
+
+        validation_ctx = _validate(
+            {"str": "foo", "num": 1.5, "bool": False}, inputs=inputs
+        )
+        self.assertFalse(validation_ctx.invalid)
+
+        validation_ctx = _validate(
+            {"str": 1, "num": True, "bool": 0}, inputs=inputs
+        )
+        self.assertListEqual(
+            [e.path for e in validation_ctx.errors],
+            [".str", ".num", ".bool"],
+        )
+
+    def test_primitive_lists(self):
+        inputs = types.Object()
+        inputs.list("nums", types.Number())
+        inputs.list("strs", types.String())
+        inputs = types.Property(inputs)
+
+        validation_ctx = _validate(
+            {"nums": list(range(1000)) + [None], "strs": ["a", "b"]},
+            inputs=inputs,
+        )
+        self.assertFalse(validation_ctx.invalid)
+
+        validation_ctx = _validate(
+            {"nums": [1, 2.5, True, "3"], "strs": ["a", 1]}, inputs=inputs
+        )
+        self.assertListEqual(
+            [e.path for e in validation_ctx.errors],
+            [".nums[2]", ".nums[3]", ".strs[1]"],
+        )
+
+    def test_nested_lists(self):
+        depth = 5000
+
+        element_type = types.String()
+        value = ["foo", 1]
+        for _ in range(depth):
+            element_type = types.List(element_type)
+
+        for _ in range(depth - 1):
+            value = [value]
+
+        inputs = types.Object()
+        inputs.define_property("nested", element_type)
+        inputs = types.Property(inputs)
+
+        validation_ctx = _validate({"nested": value}, inputs=inputs)
+
+        self.assertEqual(len(validation_ctx.errors), 1)
+        self.assertEqual(
+            validation_ctx.errors[0].path,
+            ".nested" + "[0]" * (depth - 1) + "[1]",
+        )
+
+
+class ExecutionResultTests(unittest.TestCase):
+    def test_error_result(self):
+        try:
+            raise ValueError("my error")
+        except ValueError:
+            result = foe._error_result()
+
+        self.assertIsNotNone(result.error)
+        self.assertIn("ValueError: my error", result.error)
+        self.assertIn("Traceback", result.error)
+
+    def test_error_setter(self):
+        try:
+            raise ValueError("my error")
+        except ValueError:
+            result = foe._error_result()
+
+        result.error = "another error"
+
+        self.assertEqual(result.error, "another error")
+
+    def test_to_exception(self):
+        result = foe.ExecutionResult(error="my error")
+
+        e = result.to_exception()
+
+        self.assertIsInstance(e, foe.ExecutionError)
+        self.assertEqual(str(e), "my error")
+
+    def test_to_exception_with_validation_error(self):
+        validation_ctx = _validate({})
+        result = foe.ExecutionResult(
+            error="Validation error", validation_ctx=validation_ctx
+        )
+
+        e = result.to_exception()
+
+        self.assertEqual(
+            str(e), "Validation error. Path: name. Reason: Required property"
+        )
+
+    def test_is_generator(self):
+        def gen():
+            yield 1
+
+        async def async_gen():
+            yield 1
+
+        self.assertTrue(foe.ExecutionResult(result=gen()).is_generator)
+        self.assertTrue(foe.ExecutionResult(result=async_gen()).is_generator)
+        self.assertFalse(foe.ExecutionResult(result=[1]).is_generator)
+        self.assertFalse(foe.ExecutionResult().is_generator)
+
+
+class ExecutorTests(unittest.TestCase):
+    def test_to_json_bytes(self):
+        executor = foe.Executor()
+        executor.trigger("my_operator", {"foo": "bar"})
+        executor.log("message")
+
+        d = json_util.loads(executor.to_json_bytes())
+
+        self.assertDictEqual(d, executor.to_json())
+
+    def test_result_to_json_bytes(self):
+        executor = foe.Executor()
+        executor.trigger("my_operator", {"id": ObjectId()})
+        result = foe.ExecutionResult(
+            result={"date": datetime(2023, 1, 1)}, executor=executor
+        )
+
+        d = json_util.loads(result.to_json_bytes())
+
+        self.assertDictEqual(d, result.to_json())
+
+    def test_result_to_json_bytes_unsupported_types(self):
+        class MyFloat(float):
+            pass
+
+        result = foe.ExecutionResult(
+            result={"float": MyFloat(1.5), "int": 2**70, "nan": float("nan")}
+        )
+
+        b = result.to_json_bytes()
+
+        self.assertEqual(b, json_util.dumps(result.to_json()).encode())
+
+    def test_trigger_merges_logs(self):
+        executor = foe.Executor()
+        ctx = foe.ExecutionContext(executor=executor)
+
+        message1 = ctx.trigger("console_log", {"message": "message1"})
+        message2 = ctx.trigger("console_log", {"message": "message2"})
+        ctx.trigger("my_operator", {"foo": "bar"})
+        ctx.log("message3")
+
+        self.assertListEqual(
+            executor.to_json()["requests"],
+            [
+                {
+                    "operator_uri": "console_log",
+                    "params": {"message": "message1\nmessage2"},
+                },
+                {"operator_uri": "my_operator", "params": {"foo": "bar"}},
+                {
+                    "operator_uri": "console_log",
+                    "params": {"message": "message3"},
+                },
+            ],
+        )
+
+        # messages generated by each call are unaffected by merging
+        self.assertEqual(message1.body.params, {"message": "message1"})
+        self.assertEqual(message2.body.params, {"message": "message2"})
+
+    def test_trigger_does_not_merge_other_operators(self):
+        executor = foe.Executor()
+        executor.trigger("my_operator", {"foo": "bar"})
+        executor.trigger("my_operator", {"foo": "bar"})
+
+        self.assertEqual(len(executor.to_json()["requests"]), 2)
+
+
+class ExecutionContextTests(unittest.TestCase):
+    def test_to_dict(self):
+        executor = foe.Executor()
+        request_params = {"dataset_name": "test", "params": {"foo": "bar"}}
+        ctx = foe.ExecutionContext(
+            request_params=request_params, executor=executor
+        )
+
+        self.assertDictEqual(
+            ctx.to_dict(),
+            {
+                "request_params": request_params,
+                "params": {"foo": "bar"},
+                "executor": executor,
+            },
+        )
+
+    def test_custom_attributes(self):
+        ctx = foe.ExecutionContext(request_params={"params": {}})
+
+        ctx.foo = "bar"
+        ctx._private = "value"
+
+        self.assertEqual(ctx.foo, "bar")
+        self.assertEqual(ctx.to_dict()["foo"], "bar")
+        self.assertNotIn("_private", ctx.to_dict())
+
+
+class ExecuteOrDelegateOperatorTests(unittest.TestCase):
+    @patch("fiftyone.operators.executor.prepare_operator_executor")
+    def test_sync_operator_runs_in_executor(self, mock_prepare):
+        executor = foe.Executor()
+        ctx = foe.ExecutionContext(executor=executor)
+        operator = MockSyncOperator()
+        mock_prepare.return_value = (operator, executor, ctx)
+
+        result = asyncio.run(
+            foe.execute_or_delegate_operator("my_operator", {})
+        )
+
+        self.assertIsNone(result.error)
+        self.assertNotEqual(
+            result.result["thread"], threading.current_thread().name
+        )
+
+    @patch("fiftyone.operators.executor.prepare_operator_executor")
+    def test_sync_operator_error(self, mock_prepare):
+        executor = foe.Executor()
+        ctx = foe.ExecutionContext(executor=executor)
+        operator = MockSyncOperator(success=False)
+        mock_prepare.return_value = (operator, executor, ctx)
+
+        result = asyncio.run(
+            foe.execute_or_delegate_operator("my_operator", {})
+        )
+
+        self.assertIsNone(result.result)
+        self.assertIn("MockSyncOperator failed", result.error)
+
+    def test_is_coroutine_execute(self):
+        class MockAsyncOperator(MockSyncOperator):
+            async def execute(self, ctx):
+                return {}
+
+        sync_operator = MockSyncOperator()
+        async_operator = MockAsyncOperator()
+
+        self.assertFalse(foe._is_coroutine_execute(sync_operator))
+        self.assertTrue(foe._is_coroutine_execute(async_operator))
+        self.assertFalse(sync_operator._execute_is_coro)
+        self.assertTrue(async_operator._execute_is_coro)
+
+
+class MockView(object):
+    def __init__(self, stages):
+        self.stages = stages
+        self.num_serialize_calls = 0
+
+    def _serialize(self):
+        self.num_serialize_calls += 1
+        return list(self.stages)
+
+
+class ParseCtxTests(unittest.TestCase):
+    def test_serialize_view_is_cached(self):
+        view = MockView([{"_cls": "foo"}])
+
+        view_stages1 = foe._serialize_view(view)
+        view_stages2 = foe._serialize_view(view)
+
+        self.assertListEqual(view_stages1, [{"_cls": "foo"}])
+        self.assertListEqual(view_stages2, [{"_cls": "foo"}])
+        self.assertEqual(view.num_serialize_calls, 1)
+
+    def test_serialize_view_cache_is_cleared(self):
+        view = MockView([{"_cls": "foo"}])
+        key = id(view)
+        foe._serialize_view(view)
+
+        self.assertIn(key, foe._VIEW_STAGES_CACHE)
+
+        del view
+
+        self.assertNotIn(key, foe._VIEW_STAGES_CACHE)
+
+    def test_parse_ctx_view(self):
+        view = MockView([{"_cls": "foo"}])
+
+        dataset_name, view_stages, _, _ = foe._parse_ctx(
+            {"dataset": "test", "view": view}
+        )
+
+        self.assertEqual(dataset_name, "test")
+        self.assertListEqual(view_stages, [{"_cls": "foo"}])
+
+    def test_parse_ctx_serialized_view(self):
+        dataset_name, view_stages, _, _ = foe._parse_ctx(
+            {"dataset": "test", "view": [{"_cls": "foo"}]}
+        )
+
+        self.assertEqual(dataset_name, "test")
+        self.assertListEqual(view_stages, [{"_cls": "foo"}])
+
+    @patch("fiftyone.core.dataset.load_dataset")
+    def test_parse_ctx_no_view(self, mock_load_dataset):
+        dataset_name, view_stages, _, _ = foe._parse_ctx(
+            {"dataset": "parse-ctx-test"}
+        )
+
+        self.assertEqual(dataset_name, "parse-ctx-test")
+        self.assertListEqual(view_stages, [])
+        mock_load_dataset.assert_not_called()
+
+
+class MockSecret(object):
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+
+class MockSecretsResolver(object):
+    async def get_secret(self, key, **kwargs):
+        return MockSecret(key, key.lower())
+
+
+class MockInputOperator(MockOperator):
+    def __init__(self, requires_secrets_for_input=True):
+        super().__init__(requires_secrets_for_input=requires_secrets_for_input)
+        self._plugin_secrets = ["SECRET1", "SECRET2"]
+        self.resolve_input_thread = None
+        self.resolve_input_secrets = None
+
+    def resolve_input(self, ctx):
+        self.resolve_input_thread = threading.current_thread().name
+        self.resolve_input_secrets = dict(ctx.secrets)
+        inputs = types.Object()
+        inputs.str("name", required=True)
+        return types.Property(inputs)
+
+
+class PrepareOperatorExecutorTests(unittest.TestCase):
+    def _prepare(self, operator, params):
+        with patch(
+            "fiftyone.operators.executor.OperatorRegistry"
+        ) as mock_registry, patch(
+            "fiftyone.operators.executor.PluginSecretsResolver",
+            MockSecretsResolver,
+        ):
+            mock_registry.return_value.operator_exists.return_value = True
+            mock_registry.return_value.get_operator.return_value = operator
+
+            return asyncio.run(
+                foe.prepare_operator_executor(
+                    "my_operator", {"params": params}
+                )
+            )
+
+    def test_secrets_resolved_before_inputs(self):
+        operator = MockInputOperator()
+
+        _, _, ctx = self._prepare(operator, {"name": "foo"})
+
+        self.assertEqual(
+            operator.resolve_input_thread, threading.current_thread().name
+        )
+        self.assertDictEqual(
+            operator.resolve_input_secrets,
+            {"SECRET1": "secret1", "SECRET2": "secret2"},
+        )
+        self.assertDictEqual(ctx.secrets, operator.resolve_input_secrets)
+
+    def test_secrets_resolved_concurrently(self):
+        operator = MockInputOperator(requires_secrets_for_input=False)
+
+        _, _, ctx = self._prepare(operator, {"name": "foo"})
+
+        self.assertNotEqual(
+            operator.resolve_input_thread, threading.current_thread().name
+        )
+        self.assertDictEqual(
+            ctx.secrets, {"SECRET1": "secret1", "SECRET2": "secret2"}
+        )
+
+    def test_validation_error(self):
+        operator = MockInputOperator(requires_secrets_for_input=False)
+
+        result = self._prepare(operator, {})
+
+        self.assertIsInstance(result, foe.ExecutionResult)
+        self.assertTrue(result.validation_ctx.invalid)
+
+    def test_no_inputs(self):
+        operator = MockInputOperator()
+        operator.resolve_input = lambda ctx: None
+
+        with patch(
+            "fiftyone.operators.executor.ValidationContext"
+        ) as mock_validation_ctx:
+            operator_, _, _ = self._prepare(operator, {})
+
+        self.assertIs(operator_, operator)
+        mock_validation_ctx.assert_not_called()
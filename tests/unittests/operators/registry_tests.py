@@ -0,0 +1,43 @@
+"""
+Unit tests for operators/registry.
+
+| Copyright 2017-2023, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+"""
+import unittest
+from unittest.mock import patch
+
+from fiftyone.operators.registry import OperatorRegistry
+
+
+class MockOperator(object):
+    def __init__(self, uri):
+        self.uri = uri
+
+
+@patch("fiftyone.plugins.context.build_plugin_contexts", return_value=[])
+class OperatorRegistryTests(unittest.TestCase):
+    def test_get_operator(self, mock_build_plugin_contexts):
+        operator1 = MockOperator("@test/operator1")
+        operator2 = MockOperator("@test/operator2")
+        registry = OperatorRegistry()
+
+        with patch.object(
+            registry, "list_operators", return_value=[operator1, operator2]
+        ) as mock_list_operators:
+            self.assertTrue(registry.operator_exists("@test/operator1"))
+            self.assertFalse(registry.operator_exists("@test/operator3"))
+            self.assertIs(registry.get_operator("@test/operator2"), operator2)
+            self.assertIsNone(registry.get_operator("@test/operator3"))
+            mock_list_operators.assert_called_once()
+
+    def test_get_operator_duplicate_uri(self, mock_build_plugin_contexts):
+        operator1 = MockOperator("@test/operator")
+        operator2 = MockOperator("@test/operator")
+        registry = OperatorRegistry()
+
+        with patch.object(
+            registry, "list_operators", return_value=[operator1, operator2]
+        ):
+            self.assertIs(registry.get_operator("@test/operator"), operator1)
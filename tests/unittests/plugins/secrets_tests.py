@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -72,6 +73,42 @@ class TestExecutionContext:
             SECRET_KEY2: SECRET_VALUE2,
         }
 
+    @pytest.mark.asyncio
+    async def test_resolve_secret_values_with_error(
+        self, mocker, mock_secrets_resolver
+    ):
+        def get_secret(key, **kwargs):
+            if key == SECRET_KEY2:
+                raise ValueError("Failed to get secret")
+
+            return MockSecret(key, self.secrets.get(key))
+
+        mock_secrets_resolver.get_secret.side_effect = get_secret
+        context = ExecutionContext()
+        context._secrets_client = mock_secrets_resolver
+
+        await context.resolve_secret_values([SECRET_KEY, SECRET_KEY2])
+
+        assert context.secrets == {SECRET_KEY: SECRET_VALUE}
+
+    @pytest.mark.asyncio
+    async def test_resolve_secret_values_cancelled(
+        self, mocker, mock_secrets_resolver
+    ):
+        def get_secret(key, **kwargs):
+            if key == SECRET_KEY2:
+                raise asyncio.CancelledError()
+
+            return MockSecret(key, self.secrets.get(key))
+
+        mock_secrets_resolver.get_secret.side_effect = get_secret
+        context = ExecutionContext()
+        context._secrets_client = mock_secrets_resolver
+
+        await context.resolve_secret_values([SECRET_KEY, SECRET_KEY2])
+
+        assert context.secrets == {SECRET_KEY: SECRET_VALUE}
+
 
 class TestOperatorSecrets(unittest.TestCase):
     def test_operator_add_secrets(self):